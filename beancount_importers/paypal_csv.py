@@ -4,26 +4,43 @@
 
 import csv
 import datetime
+import decimal
 import enum
+import io
 import os
 import re
 
 from beancount.core import data, flags
 from beancount.core.number import D
 from beancount.ingest import importer
-from dateutil.parser import parse as parse_date
 
 from .utils import open_account, open_accounts
 from .utils import simple_posting
 from .utils import simple_posting_pair
-from .utils import usd_amount
 from .utils import pad_account
+from .utils import parse_date_str
 
 ENCODING = 'utf-8-sig'
 DEFAULT_OPEN_DATE = datetime.date(2015, 1, 1)
 DEFAULT_INCOME_ACC = 'Income:Uncategorized'
 DEFAULT_EXPENSE_ACC = 'Expenses:Uncategorized'
 
+_FILENAME_RE = re.compile(
+    '^paypal-transactions'
+    '_[0-9]{4}-[0-9]{2}-[0-9]{2}'  # start date
+    '_([0-9]{4}-[0-9]{2}-[0-9]{2})'  # end date
+    '\\.CSV$'
+)
+
+
+def _read_file(filename):
+    """Read the full text of a statement."""
+    # Read raw bytes and decode them in one pass, rather than
+    # going through the incremental text I/O decoder.
+    with open(filename, 'rb') as fh:
+        return fh.read().decode(ENCODING)
+
+
 class Account(enum.Enum):
     """Paypal accounts."""
 
@@ -70,14 +87,42 @@ class TxnStatus(enum.Enum):
 #     MISC = 'Miscellaneous'
 
 
+# Plain values for use in the per-row loop,
+# where enum attribute access adds up
+_ACC_BAL = Account.BAL.value
+_ACC_HELD = Account.HELD.value
+_ACC_DON = Account.DON.value
+_ACC_TRANS = Account.TRANS.value
+
+_STATUS_BY_VALUE = {status.value: status for status in TxnStatus}
+
+# Types of "transactions" that don't actually move funds
+_SKIP_TYPES = frozenset({
+    'Request Received',
+    'Request Sent',
+})
+
+_HOLD_TYPES = frozenset({
+    'Payment Hold',
+    'Payment Release',
+})
+
+# Conversion rates are rounded to 5 significant digits
+_RATE_CONTEXT = decimal.Context(prec=5)
+
+# Tag sets shared by all transactions
+_PAYPAL_TAGS = frozenset({'paypal'})
+_CONVERSION_TAGS = _PAYPAL_TAGS | {'currency-conversion'}
+
+
 class PaypalTransactionsImporter(importer.ImporterProtocol):
     """Paypal CSV transactions importer."""
 
-    def __init__(self, clear_before_date, currencies=['USD'], open_date=DEFAULT_OPEN_DATE, pad=True):
+    def __init__(self, clear_before_date, currencies=('USD',), open_date=DEFAULT_OPEN_DATE, pad=True):
         """Initialize."""
         self.open_date = open_date
         self.clear_before_date = clear_before_date
-        self.currencies = currencies
+        self.currencies = list(currencies)
         self.pad = pad
 
         # Maintain a list of unique transaction dates
@@ -90,11 +135,7 @@ class PaypalTransactionsImporter(importer.ImporterProtocol):
 
     def file_date(self, file_cache):
         """Determine the date related to this file."""
-        filename_matches = re.match(
-            '^paypal-transactions'
-            '_[0-9]{4}-[0-9]{2}-[0-9]{2}'  # start date
-            '_([0-9]{4}-[0-9]{2}-[0-9]{2})'  # end date
-            '.CSV$',
+        filename_matches = _FILENAME_RE.match(
             os.path.basename(file_cache.name)
         )
 
@@ -102,15 +143,15 @@ class PaypalTransactionsImporter(importer.ImporterProtocol):
             groups = filename_matches.groups()
             if len(groups) > 0:
                 date_str = groups[0]
-                return parse_date(date_str).date()
+                return datetime.date.fromisoformat(date_str)
 
     def identify(self, file_cache):
         """Determine whether a given file can be processed by this importer."""
-        filename_matches = re.match(
-            '^paypal-transactions'
-            '_[0-9]{4}-[0-9]{2}-[0-9]{2}'  # start date
-            '_[0-9]{4}-[0-9]{2}-[0-9]{2}'  # end date
-            '.CSV$',
+        # Cheaply rule out most unrelated files before matching the regex
+        if not file_cache.name.endswith('.CSV'):
+            return False
+
+        filename_matches = _FILENAME_RE.match(
             os.path.basename(file_cache.name)
         )
 
@@ -121,9 +162,9 @@ class PaypalTransactionsImporter(importer.ImporterProtocol):
         # First check filename
         if filename_matches is not None:
             # If filename matches, check header
-            with open(file_cache.name, encoding=ENCODING) as fh:
-                reader = csv.reader(fh)
-                headers = next(reader)
+            with open(file_cache.name, encoding=ENCODING, newline='') as fh:
+                # Only the first line is needed
+                headers = next(csv.reader([fh.readline()]), None)
                 is_valid = (headers == expected_headers)
                 return is_valid
         else:
@@ -141,13 +182,12 @@ class PaypalTransactionsImporter(importer.ImporterProtocol):
             Account.DON.value,
             Account.TRANS.value,
         ], self.open_date, self.currencies)
-        entries = [
-            open_entry,
-        ] + other_open_entries
+        entries = [open_entry]
+        entries.extend(other_open_entries)
 
         if self.pad:
             pad_entry = pad_account(Account.BAL.value, self.open_date)
-            entries += pad_entry
+            entries.append(pad_entry)
 
         # Keep track of previous balances
         # (per-currency) for balance assertions
@@ -156,21 +196,58 @@ class PaypalTransactionsImporter(importer.ImporterProtocol):
         # Used for combining currency conversion transactions
         first_conv_posting = None
 
-        with open(file_cache.name, encoding=ENCODING) as fh:
-            for index, row in enumerate(csv.DictReader(fh)):
-                txn_date = parse_date(row[Header.DATE.value]).date()
-                txn_desc = (
-                    row[Header.NAME.value].strip()
-                    or row[Header.TYPE.value].strip()
+        # Date of the previous row. Rows sharing a date are
+        # consecutive, so this spares most `txn_dates` lookups.
+        last_date = None
+
+        # Type and currency take only a handful of distinct values,
+        # so keep one canonical string for each instead of one per row.
+        interned = {}
+
+        filename = file_cache.name
+        contents = _read_file(filename)
+
+        with io.StringIO(contents, newline='') as fh:
+            # Leading whitespace is dropped by the parser itself;
+            # `.strip()` below then only has trailing whitespace to handle.
+            reader = csv.reader(fh, skipinitialspace=True)
+            headers = next(reader)
+
+            # Resolve column positions once instead of
+            # building a dict for every row
+            date_col = headers.index(Header.DATE.value)
+            name_col = headers.index(Header.NAME.value)
+            type_col = headers.index(Header.TYPE.value)
+            stat_col = headers.index(Header.STAT.value)
+            cur_col = headers.index(Header.CUR.value)
+            amt_col = headers.index(Header.AMT.value)
+            bal_col = headers.index(Header.BAL.value)
+
+            # Consecutive rows usually share a date; only
+            # parse it again when the raw string changes
+            last_date_str = None
+
+            for index, row in enumerate(reader):
+                date_str = row[date_col]
+                if date_str != last_date_str:
+                    last_date_str = date_str
+                    txn_date = parse_date_str(date_str)
+                txn_type = row[type_col].strip()
+                txn_type = interned.setdefault(txn_type, txn_type)
+                txn_desc = row[name_col].strip() or txn_type
+                txn_amt = row[amt_col].replace(',', '').strip()
+                txn_cur = row[cur_col].strip()
+                txn_cur = interned.setdefault(txn_cur, txn_cur)
+                row_status = row[stat_col].strip()
+                # Fall back to the enum itself to raise on unknown statuses
+                txn_status = (
+                    _STATUS_BY_VALUE.get(row_status)
+                    or TxnStatus(row_status)
                 )
-                txn_amt = row[Header.AMT.value].replace(',', '').strip()
-                txn_cur = row[Header.CUR.value].strip()
-                txn_type = row[Header.TYPE.value].strip()
-                txn_status = TxnStatus(row[Header.STAT.value].strip())
-                balance = row[Header.BAL.value]
+                balance = row[bal_col]
 
                 flag = flags.FLAG_WARNING
-                more_tags = set()
+                tags = _PAYPAL_TAGS
 
                 # Whether to skip outputting a transaction
                 # (but finish the loop iteration)
@@ -180,11 +257,12 @@ class PaypalTransactionsImporter(importer.ImporterProtocol):
                 if not txn_amt:
                     continue
 
-                # Set fallback account
-                if float(txn_amt) > 0:
-                    src_acc = DEFAULT_INCOME_ACC
-                elif float(txn_amt) < 0:
+                # Set fallback account. The amount is already normalized,
+                # so its sign can be read without parsing a number.
+                if txn_amt.startswith('-'):
                     src_acc = DEFAULT_EXPENSE_ACC
+                else:
+                    src_acc = DEFAULT_INCOME_ACC
 
                 # Paypal bug? Some transactions don't seem to affect
                 # the balance. Ignore such "ghost" transactions.
@@ -194,39 +272,32 @@ class PaypalTransactionsImporter(importer.ImporterProtocol):
 
                 # Skip certain types of "transactions"
                 # that don't actually move funds
-                skip_types = [
-                    'Request Received',
-                    'Request Sent'
-                ]
-
-                if txn_type in skip_types:
+                if txn_type in _SKIP_TYPES:
                     continue
 
                 if txn_type == 'General Withdrawal':
                     if txn_date < self.clear_before_date:
                         dst_acc = 'Equity:Earnings:Previous'
                     else:
-                        dst_acc = Account.TRANS.value
+                        dst_acc = _ACC_TRANS
 
                 elif txn_type == 'Donation Payment':
-                    src_acc = Account.DON.value
+                    src_acc = _ACC_DON
                     flag = flags.FLAG_OKAY
 
-                elif txn_type in ['Payment Hold', 'Payment Release']:
-                    src_acc = Account.HELD.value
+                elif txn_type in _HOLD_TYPES:
+                    src_acc = _ACC_HELD
                     flag = flags.FLAG_OKAY
 
-                dst_acc = Account.BAL.value
+                dst_acc = _ACC_BAL
 
-                meta_kwargs = {
+                # Same dict as `data.new_metadata` builds, without the call
+                meta = {
+                    'filename': filename,
+                    'lineno': index,
                     'status': txn_status.value,
                     'type': txn_type,
                 }
-                meta = data.new_metadata(
-                    file_cache.name,
-                    index,
-                    meta_kwargs.items(),
-                )
 
                 # Combine currency conversions into single transactions
                 if txn_type == 'General Currency Conversion':
@@ -235,7 +306,7 @@ class PaypalTransactionsImporter(importer.ImporterProtocol):
                         # conversion transaction, then save this info
                         # but don't output a transaction.
                         first_conv_posting = simple_posting(
-                            account=Account.BAL.value,
+                            account=_ACC_BAL,
                             amount=txn_amt,
                             currency=txn_cur,
                         )
@@ -245,7 +316,7 @@ class PaypalTransactionsImporter(importer.ImporterProtocol):
                         # transaction, then use the previous one to
                         # output a single transaction now.
                         second_conv_posting = simple_posting(
-                            account=Account.BAL.value,
+                            account=_ACC_BAL,
                             amount=txn_amt,
                             currency=txn_cur,
                         )
@@ -254,10 +325,12 @@ class PaypalTransactionsImporter(importer.ImporterProtocol):
                         first_num = first_conv_posting.units.number
                         second_num = second_conv_posting.units.number
                         # Add the minus sign because the postings sum to zero.
-                        conversion_rate = -first_num / second_num
+                        conversion_rate = _RATE_CONTEXT.divide(
+                            -first_num, second_num
+                        )
                         second_conv_posting = second_conv_posting._replace(
                             price=data.Amount(
-                                D(f'{conversion_rate:.5g}'),
+                                conversion_rate,
                                 first_conv_posting.units.currency
                             )
                         )
@@ -266,7 +339,7 @@ class PaypalTransactionsImporter(importer.ImporterProtocol):
                             first_conv_posting,
                             second_conv_posting,
                         ]
-                        more_tags.add('currency-conversion')
+                        tags = _CONVERSION_TAGS
                         flag = flags.FLAG_OKAY
                 else:
                     # If this isn't a currency conversion
@@ -286,8 +359,8 @@ class PaypalTransactionsImporter(importer.ImporterProtocol):
                         flag=flag,
                         payee=None,
                         narration=txn_desc,
-                        tags={'paypal'} | more_tags,
-                        links=set(),
+                        tags=tags,
+                        links=data.EMPTY_SET,
                         postings=postings,
                     )
                     entries.append(txn)
@@ -296,19 +369,19 @@ class PaypalTransactionsImporter(importer.ImporterProtocol):
                 # each time we encounter a new date, the previous
                 # transaction's running balance should be today's
                 # opening balance.
-                if txn_date not in self.txn_dates:
+                if txn_date != last_date and txn_date not in self.txn_dates:
                     # Record that we have encountered this date,
                     # so as to avoid duplicate / erroneous balance assertions
                     self.txn_dates.add(txn_date)
 
                     for cur, prev_balance in prev_balances.items():
                         balance_date = txn_date
-                        meta = data.new_metadata(file_cache.name, index)
+                        meta = {'filename': filename, 'lineno': index}
                         bal_amt = data.Amount(D(prev_balance), cur)
                         balance_entry = data.Balance(
                             meta,
                             balance_date,
-                            Account.BAL.value,
+                            _ACC_BAL,
                             bal_amt,
                             tolerance=None,
                             diff_amount=None,
@@ -319,5 +392,6 @@ class PaypalTransactionsImporter(importer.ImporterProtocol):
                 # Save this transaction's balance in case
                 # it's the last for the day.
                 prev_balances[txn_cur] = balance
+                last_date = txn_date
 
         return entries
@@ -2,10 +2,10 @@
 
 """Beancount importer for schwab transactions CSV."""
 
+import contextlib
 import csv
 import re
 import os
-from dateutil.parser import parse as parse_date
 import datetime
 import enum
 
@@ -18,8 +18,10 @@ from ..utils import simple_posting_pair
 from ..utils import usd_amount
 from ..utils import open_accounts
 from ..utils import pad_account
+from ..utils import parse_date_str
 
 ENCODING = 'utf8'
+DATE_FORMAT = '%m/%d/%Y'
 DEFAULT_OPEN_DATE = datetime.date(2016, 1, 1)
 DEFAULT_EXPENSE_ACC = 'Expenses:Uncategorized'
 DEFAULT_INCOME_ACC = 'Income:Uncategorized'
@@ -50,9 +52,33 @@ class TxnType(enum.Enum):
     WIRE = 'WIRE'
 
 
+# Plain values for use in the per-row loop,
+# where enum attribute access adds up
+_TYPE_ATM_REBATE = TxnType.ATM_REBATE.value
+_TYPE_INT_ADJUST = TxnType.INT_ADJUST.value
+_TXN_TYPES = frozenset(txn_type.value for txn_type in TxnType)
+
+
+_ACCOUNT_FILENAME_RE = re.compile(
+    '^([A-Za-z][A-Za-z0-9_-]*)_'  # account name
+    'Transactions_'
+    '[0-9]{8}-'  # access date
+    '[0-9]*'  # report number?
+    '\\.CSV$'
+)
+
+_IDENTIFY_RE = re.compile(
+    '^[A-Za-z][A-Za-z_]*_Checking_'  # account name
+    'Transactions_'
+    '[0-9]{8}-'  # access date
+    '[0-9]*'  # report number?
+    '\\.CSV$'
+)
+
+
 # These lines contain junk
 # (counting from first line = 1)
-SKIP_LINES = [1, 3, 4]
+SKIP_LINES = frozenset({1, 3, 4})
 
 def read_records(filename, skip_lines=SKIP_LINES):
     """Read CSV lines (including the header).
@@ -60,13 +86,11 @@ def read_records(filename, skip_lines=SKIP_LINES):
     Skip lines that are known to be irrelevant.
     Yields (line_num, records) for each line."""
 
-    with open(filename, encoding=ENCODING) as fh:
+    with open(filename, encoding=ENCODING, newline='') as fh:
         reader = csv.reader(fh)
-        for i, fields in enumerate(reader):
-            if i+1 in skip_lines:
-                continue
-            else:
-                yield i+1, fields
+        for line_num, fields in enumerate(reader, start=1):
+            if line_num not in skip_lines:
+                yield line_num, fields
 
 
 class SchwabBankTransactionsImporter(importer.ImporterProtocol):
@@ -102,12 +126,7 @@ class SchwabBankTransactionsImporter(importer.ImporterProtocol):
         """Determine the account suffix name (full name without prefix).
 
         e.g. PersonalChecking."""
-        filename_matches = re.match(
-            '(^[A-z].*)_'  # account name
-            'Transactions_'
-            '[0-9]{8}-'  # access date
-            '[0-9]*'  # report number?
-            '.CSV$',
+        filename_matches = _ACCOUNT_FILENAME_RE.match(
             os.path.basename(file_cache.name)
         )
 
@@ -124,12 +143,11 @@ class SchwabBankTransactionsImporter(importer.ImporterProtocol):
 
     def identify(self, file_cache):
         """Determine whether a given file can be processed by this importer."""
-        filename_matches = re.match(
-            '^[A-z]*_Checking_'  # account name
-            'Transactions_'
-            '[0-9]{8}-'  # access date
-            '[0-9]*'  # report number?
-            '.CSV$',
+        # Cheaply rule out most unrelated files before matching the regex
+        if not file_cache.name.endswith('.CSV'):
+            return False
+
+        filename_matches = _IDENTIFY_RE.match(
             os.path.basename(file_cache.name)
         )
 
@@ -137,8 +155,10 @@ class SchwabBankTransactionsImporter(importer.ImporterProtocol):
 
         # First check filename
         if filename_matches is not None:
-            # If filename matches, check header
-            for i, headers in read_records(file_cache.name):
+            # If filename matches, check header, closing
+            # the file as soon as the header has been read
+            with contextlib.closing(read_records(file_cache.name)) as records:
+                _, headers = next(records, (None, None))
                 is_valid = (headers == expected_headers)
                 return is_valid
         else:
@@ -170,24 +190,45 @@ class SchwabBankTransactionsImporter(importer.ImporterProtocol):
             # 'Equity:OpeningBalances'
         ], self.open_date)
         pad_entry = pad_account(account_name, self.open_date)
-        entries = open_entries + [pad_entry]
+        entries = open_entries
+        entries.append(pad_entry)
 
         records_reader = read_records(file_cache.name)
         # Assume the first line returned contains headers
         (header_index, headers) = next(records_reader)
 
-        for index, records in records_reader:
-            # Assume each line has the same number of fields
-            row = dict(zip(headers, records))
+        # Resolve column positions once instead of
+        # building a dict for every row
+        date_col = headers.index(Header.DATE.value)
+        desc_col = headers.index(Header.DESC.value)
+        type_col = headers.index(Header.TYPE.value)
+        wdl_col = headers.index(Header.WDL.value)
+        dep_col = headers.index(Header.DEP.value)
+        bal_col = headers.index(Header.BAL.value)
+
+        filename = file_cache.name
+
+        # Consecutive rows usually share a date; only
+        # parse it again when the raw string changes
+        last_date_str = None
+
+        # Date of the previous row. Rows sharing a date are
+        # consecutive, so this spares most `txn_dates` lookups.
+        last_date = None
 
-            txn_date = parse_date(row[Header.DATE.value]).date()
-            txn_desc = row[Header.DESC.value]
-            txn_type = row[Header.TYPE.value]
+        for index, row in records_reader:
+            # Assume each line has the same number of fields
+            date_str = row[date_col]
+            if date_str != last_date_str:
+                last_date_str = date_str
+                txn_date = parse_date_str(date_str, DATE_FORMAT)
+            txn_desc = row[desc_col]
+            txn_type = row[type_col]
 
             # Amount is split into two parts (both always positive)
-            # Remove dollar sign
-            txn_wdl = row[Header.WDL.value].replace('$', '')
-            txn_dep = row[Header.DEP.value].replace('$', '')
+            # Remove leading dollar sign
+            txn_wdl = row[wdl_col].lstrip('$')
+            txn_dep = row[dep_col].lstrip('$')
 
             # Set default accounts if auto-categorization fails
             src_acc = DEFAULT_INCOME_ACC
@@ -196,28 +237,15 @@ class SchwabBankTransactionsImporter(importer.ImporterProtocol):
             # Default flag if not auto-categorized
             flag = flags.FLAG_WARNING
 
-            if txn_type == TxnType.ACH.value:
-                pass
-            elif txn_type == TxnType.ATM.value:
-                pass
-            elif txn_type == TxnType.ATM_REBATE.value:
+            # Other known types keep the uncategorized defaults.
+            # TODO: Extract other account from TRANSFER descriptions
+            if txn_type == _TYPE_ATM_REBATE:
                 src_acc = atm_rebate_acc
                 flag = flags.FLAG_OKAY
-            elif txn_type == TxnType.CHECK.value:
-                pass
-            elif txn_type == TxnType.DEPOSIT.value:
-                pass
-            elif txn_type == TxnType.INT_ADJUST.value:
+            elif txn_type == _TYPE_INT_ADJUST:
                 src_acc = interest_acc
                 flag = flags.FLAG_OKAY
-            elif txn_type == TxnType.TRANSFER.value:
-                # TODO: Extract other account from description
-                pass
-            elif txn_type == TxnType.VISA.value:
-                pass
-            elif txn_type == TxnType.WIRE.value:
-                pass
-            else:
+            elif txn_type not in _TXN_TYPES:
                 msg = "Unknown transaction type: {}".format(txn_type)
                 raise ValueError(msg)
 
@@ -253,20 +281,20 @@ class SchwabBankTransactionsImporter(importer.ImporterProtocol):
                 ])
                 raise ValueError(msg)
 
-            meta_kwargs = {'type': txn_type}
-            meta = data.new_metadata(
-                file_cache.name,
-                index,
-                meta_kwargs.items(),
-            )
+            # Same dict as `data.new_metadata` builds, without the call
+            meta = {
+                'filename': filename,
+                'lineno': index,
+                'type': txn_type,
+            }
             txn = data.Transaction(
                 meta=meta,
                 date=txn_date,
                 flag=flag,
                 payee=None,
                 narration=txn_desc,
-                tags=set(),
-                links=set(),
+                tags=data.EMPTY_SET,
+                links=data.EMPTY_SET,
                 postings=postings,
             )
 
@@ -277,13 +305,13 @@ class SchwabBankTransactionsImporter(importer.ImporterProtocol):
             # chronologically the last, which means that the running
             # balance for that transaction should be the opening balance
             # balance on the following day.
-            if txn_date not in self.txn_dates:
+            if txn_date != last_date and txn_date not in self.txn_dates:
                 # Record that we have encountered this date,
                 # so as to avoid duplicate / erroneous balance assertions
                 self.txn_dates.add(txn_date)
 
-                # Remove dollar sign
-                balance = row[Header.BAL.value].replace('$', '')
+                # Remove dollar sign (which may follow a minus sign)
+                balance = row[bal_col].replace('$', '')
                 balance_date = txn_date + datetime.timedelta(days=1)
                 balance_entry = data.Balance(
                     meta,
@@ -296,4 +324,6 @@ class SchwabBankTransactionsImporter(importer.ImporterProtocol):
 
                 entries.append(balance_entry)
 
+            last_date = txn_date
+
         return entries
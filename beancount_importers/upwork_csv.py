@@ -5,20 +5,29 @@
 import csv
 import datetime
 import enum
+import functools
 import os
 import re
 
 from beancount.core import data, flags
 from beancount.ingest import importer
-from dateutil.parser import parse as parse_date
 
 from .utils import open_accounts, simple_posting_pair, usd_amount
+from .utils import parse_date_str
 
 
 ENCODING='utf8'
+DATE_FORMAT = '%b %d, %Y'
 DEFAULT_OPEN_DATE = datetime.date(2018, 1, 1)
 IN_TRANSIT_ACCOUNT_PREFIX = 'Assets:InTransit:Upwork'
 
+_FILENAME_RE = re.compile(
+    '^statements'
+    '_[0-9]{4}-[0-9]{2}-[0-9]{2}'  # start date
+    '_([0-9]{4}-[0-9]{2}-[0-9]{2})'  # end date
+    '\\.csv$'
+)
+
 class Account(enum.Enum):
     """Upwork accounts."""
 
@@ -49,6 +58,10 @@ class Header(enum.Enum):
     BAL = 'Balance'
 
 
+# Unquoted header line, as most statements spell it
+_HEADER_LINE = ','.join(hd.value for hd in Header)
+
+
 class TxnType(enum.Enum):
     """Upwork transactions."""
 
@@ -73,6 +86,31 @@ class UpworkTxnTag(enum.Enum):
     MISC = 'Upwork-Miscellaneous'
 
 
+# Plain values for use in the per-row loop,
+# where enum attribute access adds up
+_ACC_BAL = Account.BAL.value
+
+_TXN_TYPE_BY_VALUE = {txn_type.value: txn_type for txn_type in TxnType}
+
+# Account on the other side of the balance for each
+# transaction type (withdrawals depend on the description)
+_COUNTERPART_ACCOUNTS = {
+    TxnType.FIXED_PRICE: Account.FP.value,
+    TxnType.BONUS: Account.BON.value,
+    TxnType.HOURLY: Account.HR.value,
+    TxnType.REFUND: Account.REF.value,
+    TxnType.SERVICE_FEE: Account.SF.value,
+    TxnType.MISC: Account.MISC.value,
+}
+
+# Posting builders with both accounts already bound,
+# leaving only the amount to pass per row
+_POSTING_BUILDERS = {
+    txn_type: functools.partial(simple_posting_pair, _ACC_BAL, counterpart)
+    for txn_type, counterpart in _COUNTERPART_ACCOUNTS.items()
+}
+
+
 def upwork_in_transit_account_name(last_four):
     """Create the full in-transit account name
     given the last four digits of the destination
@@ -84,20 +122,42 @@ def txn_type_to_tag(txn_type: TxnType):
     """Convert transaction type (from CSV) to beancount tag."""
     # NOTE: This assumes that `TxnType` and `UpworkTxnTag`
     # variant names are identical.
-    return UpworkTxnTag.__getattr__(txn_type.name)
+    return UpworkTxnTag[txn_type.name]
+
+
+# Tag sets shared by all transactions of each type
+_TXN_TYPE_TAGS = {
+    txn_type: frozenset({txn_type_to_tag(txn_type).value})
+    for txn_type in TxnType
+}
+
+
+# Precedes the last four digits of the account in withdrawal descriptions
+_ACCOUNT_MARKER = ': xxxx-'
 
 
 def get_last_four_from_upwork_description(txn_desc):
     """Extract the last four digits of destination account
     from Upwork withdrawal description."""
-    matches = re.match('.*: xxxx-([0-9]{4})', txn_desc)
-    if matches is not None and len(matches.groups()) > 0:
-        last_four = matches[1]
-        return last_four
-    else:
-        msg = ("Could not extract acount number from "
-               f"Withdrawal description: '{txn_desc}'")
-        raise ValueError(msg)
+    # Take the digits after the last ': xxxx-' that is followed by
+    # four of them, as a greedy '.*: xxxx-([0-9]{4})' match would
+    # (including stopping at the first line break), without a regex
+    line = txn_desc.partition('\n')[0]
+    end = len(line)
+    while True:
+        start = line.rfind(_ACCOUNT_MARKER, 0, end)
+        if start < 0:
+            break
+        digits_start = start + len(_ACCOUNT_MARKER)
+        last_four = line[digits_start:digits_start + 4]
+        if len(last_four) == 4 and last_four.isascii() and last_four.isdigit():
+            return last_four
+        # Try again with the next marker to the left
+        end = start
+
+    msg = ("Could not extract acount number from "
+           f"Withdrawal description: '{txn_desc}'")
+    raise ValueError(msg)
 
 
 def get_account_from_upwork_description(txn_desc, account_dict):
@@ -121,17 +181,24 @@ class UpworkTransactionsImporter(importer.ImporterProtocol):
         # to help construct balance assertions
         self.txn_dates = set()
 
+        # Open directives only depend on the arguments above,
+        # so build them once rather than on every `extract`
+        in_transit_accounts = [
+            upwork_in_transit_account_name(last_four)
+            for last_four in self.bank_account_dict.keys()
+        ]
+        accounts_to_open = [
+            acc.value for acc in Account
+        ] + in_transit_accounts
+        self._open_entries = open_accounts(accounts_to_open, self.open_date)
+
     def file_account(self, file_cache):
         """Determine account related to this file."""
         return 'Assets:Upwork'
 
     def file_date(self, file_cache):
         """Determine the date related to this file."""
-        filename_matches = re.match(
-            '^statements'
-            '_[0-9]{4}-[0-9]{2}-[0-9]{2}'  # start date
-            '_([0-9]{4}-[0-9]{2}-[0-9]{2})'  # end date
-            '.csv$',
+        filename_matches = _FILENAME_RE.match(
             os.path.basename(file_cache.name)
         )
 
@@ -139,15 +206,15 @@ class UpworkTransactionsImporter(importer.ImporterProtocol):
             groups = filename_matches.groups()
             if len(groups) > 0:
                 date_str = groups[0]
-                return parse_date(date_str).date()
+                return datetime.date.fromisoformat(date_str)
 
     def identify(self, file_cache):
         """Determine whether a given file can be processed by this importer."""
-        filename_matches = re.match(
-            '^statements'
-            '_[0-9]{4}-[0-9]{2}-[0-9]{2}'  # start date
-            '_[0-9]{4}-[0-9]{2}-[0-9]{2}'  # end date
-            '.csv$',
+        # Cheaply rule out most unrelated files before matching the regex
+        if not file_cache.name.endswith('.csv'):
+            return False
+
+        filename_matches = _FILENAME_RE.match(
             os.path.basename(file_cache.name)
         )
 
@@ -158,33 +225,63 @@ class UpworkTransactionsImporter(importer.ImporterProtocol):
         # First check filename
         if filename_matches is not None:
             # If filename matches, check header
-            with open(file_cache.name, encoding=ENCODING) as fh:
-                reader = csv.reader(fh)
-                headers = next(reader)
-                is_valid = (headers == expected_headers)
-                return is_valid
+            # Only the first line is needed. Don't go through the
+            # memoized full read: identify-only runs (e.g. bean-identify)
+            # would never reuse it.
+            with open(file_cache.name, encoding=ENCODING, newline='') as fh:
+                line = fh.readline().rstrip('\r\n')
+
+            # Compare the raw line first; only parse
+            # it as CSV (e.g. quoted fields) otherwise
+            if line == _HEADER_LINE:
+                return True
+
+            headers = next(csv.reader([line]), None)
+            is_valid = (headers == expected_headers)
+            return is_valid
         else:
             return False
 
     def extract(self, file_cache):
         """Extract the transactions from the CSV."""
-        in_transit_accounts = [
-            upwork_in_transit_account_name(last_four)
-            for last_four in self.bank_account_dict.keys()
-        ]
-        accounts_to_open = [
-            acc.value for acc in Account
-        ] + in_transit_accounts
-        open_entries = open_accounts(accounts_to_open, self.open_date)
-
-        entries = open_entries
-
-        with open(file_cache.name, encoding=ENCODING) as fh:
-            for index, row in enumerate(csv.DictReader(fh)):
-                txn_date = parse_date(row[Header.DATE.value]).date()
-                txn_desc = row[Header.DESC.value]
-                txn_amt = row[Header.AMT.value]
-                txn_type = TxnType(row[Header.TYPE.value])
+        # Copy, so that appending doesn't modify the cached list
+        entries = list(self._open_entries)
+
+        filename = file_cache.name
+
+        with open(filename, encoding=ENCODING, newline='') as fh:
+            reader = csv.reader(fh)
+            headers = next(reader)
+
+            # Resolve column positions once instead of
+            # building a dict for every row
+            date_col = headers.index(Header.DATE.value)
+            desc_col = headers.index(Header.DESC.value)
+            amt_col = headers.index(Header.AMT.value)
+            type_col = headers.index(Header.TYPE.value)
+            bal_col = headers.index(Header.BAL.value)
+
+            # Consecutive rows usually share a date; only
+            # parse it again when the raw string changes
+            last_date_str = None
+
+            # Date of the previous row. Rows sharing a date are
+            # consecutive, so this spares most `txn_dates` lookups.
+            last_date = None
+
+            for index, row in enumerate(reader):
+                date_str = row[date_col]
+                if date_str != last_date_str:
+                    last_date_str = date_str
+                    txn_date = parse_date_str(date_str, DATE_FORMAT)
+                txn_desc = row[desc_col]
+                txn_amt = row[amt_col]
+                row_type = row[type_col]
+                # Fall back to the enum itself to raise on unknown types
+                txn_type = (
+                    _TXN_TYPE_BY_VALUE.get(row_type)
+                    or TxnType(row_type)
+                )
 
                 if txn_type == TxnType.WITHDRAWAL:
                     # Before this date, we have no matching bank transactions.
@@ -200,71 +297,33 @@ class UpworkTransactionsImporter(importer.ImporterProtocol):
                     # which is why `UPWORK_ACC_BAL` is always
                     # the first argument to `simple_posting_pair`
                     postings = simple_posting_pair(
-                        Account.BAL.value,
+                        _ACC_BAL,
                         dest_account,
                         txn_amt
                     )
 
-                elif txn_type == TxnType.FIXED_PRICE:
-                    postings = simple_posting_pair(
-                        Account.BAL.value,
-                        Account.FP.value,
-                        txn_amt
-                    )
-
-                elif txn_type == TxnType.BONUS:
-                    postings = simple_posting_pair(
-                        Account.BAL.value,
-                        Account.BON.value,
-                        txn_amt
-                    )
-
-                elif txn_type == TxnType.HOURLY:
-                    postings = simple_posting_pair(
-                        Account.BAL.value,
-                        Account.HR.value,
-                        txn_amt
-                    )
-
-                elif txn_type == TxnType.REFUND:
-                    postings = simple_posting_pair(
-                        Account.BAL.value,
-                        Account.REF.value,
-                        txn_amt
-                    )
-
-                elif txn_type == TxnType.SERVICE_FEE:
-                    postings = simple_posting_pair(
-                        Account.BAL.value,
-                        Account.SF.value,
-                        txn_amt
-                    )
-
-                elif txn_type == TxnType.MISC:
-                    postings = simple_posting_pair(
-                        Account.BAL.value,
-                        Account.MISC.value,
-                        txn_amt
-                    )
-
                 else:
-                    msg = "Unknown transaction type: {}".format(txn_type)
-                    raise ValueError(msg)
-
-                meta_kwargs = {'type': txn_type.value}
-                meta = data.new_metadata(
-                    file_cache.name,
-                    index,
-                    meta_kwargs.items(),
-                )
+                    build_postings = _POSTING_BUILDERS.get(txn_type)
+                    if build_postings is None:
+                        msg = "Unknown transaction type: {}".format(txn_type)
+                        raise ValueError(msg)
+
+                    postings = build_postings(txn_amt)
+
+                # Same dict as `data.new_metadata` builds, without the call
+                meta = {
+                    'filename': filename,
+                    'lineno': index,
+                    'type': row_type,
+                }
                 txn = data.Transaction(
                     meta=meta,
                     date=txn_date,
                     flag=flags.FLAG_OKAY,
                     payee=None,
                     narration=txn_desc,
-                    tags={txn_type_to_tag(txn_type).value},
-                    links=set(),
+                    tags=_TXN_TYPE_TAGS[txn_type],
+                    links=data.EMPTY_SET,
                     postings=postings,
                 )
                 entries.append(txn)
@@ -274,17 +333,17 @@ class UpworkTransactionsImporter(importer.ImporterProtocol):
                 # chronologically the last, which means that the running
                 # balance for that transaction should be the opening balance
                 # balance on the following day.
-                if txn_date not in self.txn_dates:
+                if txn_date != last_date and txn_date not in self.txn_dates:
                     # Record that we have encountered this date,
                     # so as to avoid duplicate / erroneous balance assertions
                     self.txn_dates.add(txn_date)
 
-                    balance = row[Header.BAL.value]
+                    balance = row[bal_col]
                     balance_date = txn_date + datetime.timedelta(days=1)
                     balance_entry = data.Balance(
                         meta,
                         balance_date,
-                        Account.BAL.value,
+                        _ACC_BAL,
                         usd_amount(balance),
                         tolerance=None,
                         diff_amount=None,
@@ -292,4 +351,6 @@ class UpworkTransactionsImporter(importer.ImporterProtocol):
 
                     entries.append(balance_entry)
 
+                last_date = txn_date
+
         return entries
@@ -2,8 +2,16 @@
 
 """Common utility functions for beancount importers."""
 
+import concurrent.futures
+import datetime
+import functools
+import itertools
+import os
+
 from beancount.core import data
+from beancount.ingest import cache
 from beancount.core.number import D
+from dateutil.parser import parse as parse_date
 
 USD = 'USD'
 
@@ -14,12 +22,13 @@ import uuid
 
 def transaction_id(txn: data.Transaction):
     """Generate a unique and consistent id from a transaction's metadata."""
-    h = hashlib.sha256()
     if txn.meta is not None:
         if 'filename' in txn.meta and 'lineno' in txn.meta:
-            h.update(txn.meta['filename'].encode())
-            h.update(txn.meta['lineno'].to_bytes(8, 'big'))
-            d = h.digest()
+            # Hash filename and line number in a single call
+            d = hashlib.sha256(
+                txn.meta['filename'].encode()
+                + txn.meta['lineno'].to_bytes(8, 'big')
+            ).digest()
             u = uuid.UUID(bytes=d[:16])
             return str(u)
 
@@ -29,6 +38,17 @@ def split_txn(txn):
     # This won't work for more complex transactions.
     assert len(txn.postings) == 2
 
+    # Usually the postings balance, so one has each sign
+    # and checking both of them settles the order
+    first, second = txn.postings
+    first_num = first.units.number
+    second_num = second.units.number
+    if first_num > 0 and second_num < 0:
+        return (second, first)
+    elif first_num < 0 and second_num > 0:
+        return (first, second)
+
+    # Otherwise (e.g. zero amounts), keep the last posting of each sign
     src_posting = None
     dst_posting = None
 
@@ -41,9 +61,40 @@ def split_txn(txn):
     return (src_posting, dst_posting)
 
 
+@functools.lru_cache(maxsize=4096)
+def parse_date_str(date_str, fmt=None):
+    """Parse a date string into a `datetime.date`.
+
+    Try `fmt` (or ISO 8601 if not given) first and fall back to dateutil.
+    Many rows share a date, so results are memoized on the raw string."""
+    try:
+        if fmt is None:
+            return datetime.date.fromisoformat(date_str)
+        return datetime.datetime.strptime(date_str, fmt).date()
+    except ValueError:
+        return parse_date(date_str).date()
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_decimal(number_str):
+    """Parse a number string into a Decimal (memoized)."""
+    return D(number_str)
+
+
+def _to_decimal(number):
+    """Convert a number or number string to a Decimal.
+
+    Statements repeat the same amounts often, so strings go through a cache.
+    Other values don't: e.g. Decimal('1.0') and Decimal('1.00') hash equal,
+    but must keep their own precision."""
+    if isinstance(number, str):
+        return _parse_decimal(number)
+    return D(number)
+
+
 def usd_amount(dollars):
     """Amount in USD."""
-    return data.Amount(D(dollars), USD)
+    return data.Amount(_to_decimal(dollars), USD)
 
 def simple_usd_posting(account, dollars, negative=False):
     """Create a simple posting in USD with no metadata or cost basis."""
@@ -52,20 +103,24 @@ def simple_usd_posting(account, dollars, negative=False):
 
 def simple_posting(account, amount, negative=False, currency=USD):
     """Create a simple posting with no metadata or cost basis."""
-    amount = data.Amount(D(amount), currency)
+    number = _to_decimal(amount)
     if negative:
-        amount = -amount
+        # Negate the number rather than building a second Amount
+        number = -number
+    amount = data.Amount(number, currency)
     return data.Posting(account, amount, None, None, None, None)
 
 
-def simple_posting_pair(pos_acc, neg_acc, amount, currency='USD'):
+def simple_posting_pair(pos_acc, neg_acc, amount, currency=USD):
     """Create a pair of simple postings.
 
     Add `dollars` to `pos_acc` and subtract them from `neg_acc`.
     """
+    # Parse the amount once and build both postings directly
+    number = _to_decimal(amount)
     return [
-        simple_posting(pos_acc, amount, currency=currency),
-        simple_posting(neg_acc, amount, negative=True, currency=currency),
+        data.Posting(pos_acc, data.Amount(number, currency), None, None, None, None),
+        data.Posting(neg_acc, data.Amount(-number, currency), None, None, None, None),
     ]
 
 
@@ -101,3 +156,55 @@ def pad_account(account, date, src_account='Equity:OpeningBalances'):
     """Pad account balance from Equity:OpeningBalances."""
     meta = blank_metadata()
     return data.Pad(meta, date, account, src_account)
+
+
+def _extract_file(importer, filename):
+    """Extract the entries of a single file (run in a worker process)."""
+    # The file cache only accepts absolute paths
+    return importer.extract(cache.get_file(os.path.abspath(filename)))
+
+
+def _merged_sortkey(indexed_entry):
+    """Sort key for `(file_index, entry)` pairs from `extract_many`.
+
+    Like `data.entry_sortkey`, but tolerates a missing line number
+    (e.g. on Pad directives) and keeps files in the order given."""
+    file_index, entry = indexed_entry
+    return (
+        entry.date,
+        data.SORT_ORDER.get(type(entry), 0),
+        file_index,
+        entry.meta['lineno'] or 0,
+    )
+
+
+def extract_many(filenames, importer, max_workers=None):
+    """Extract entries from several files in parallel, one process per file.
+
+    Each worker gets its own copy of `importer`, so state kept on it
+    (e.g. dates already given balance assertions) is not shared across
+    files: overlapping statements may yield duplicate balance assertions.
+    Open and Pad directives repeated by each file are only kept once.
+
+    Return the entries of all files, sorted."""
+    with concurrent.futures.ProcessPoolExecutor(max_workers) as executor:
+        results = executor.map(
+            _extract_file,
+            itertools.repeat(importer),
+            filenames,
+        )
+
+        indexed_entries = []
+        # (directive type, account) of the Open and Pad directives kept so far
+        seen_directives = set()
+        for file_index, file_entries in enumerate(results):
+            for entry in file_entries:
+                if isinstance(entry, (data.Open, data.Pad)):
+                    key = (type(entry), entry.account)
+                    if key in seen_directives:
+                        continue
+                    seen_directives.add(key)
+                indexed_entries.append((file_index, entry))
+
+    indexed_entries.sort(key=_merged_sortkey)
+    return [entry for _, entry in indexed_entries]
@@ -0,0 +1,24 @@
+import datetime
+
+import pytest
+from beancount.core import data
+from beancount.ingest import cache
+
+from beancount_importers.paypal_csv import PaypalTransactionsImporter
+
+
+@pytest.mark.parametrize('pad, num_pads', [(True, 1), (False, 0)])
+def test_extract_pad(tmp_path, pad, num_pads):
+    path = tmp_path / 'paypal-transactions_2021-01-01_2021-01-31.CSV'
+    path.write_text(
+        'Date,Time,TimeZone,Name,Type,Status,Currency,Amount,Receipt ID,Balance\n'
+        '2021-01-02,10:00,PST,Alice,General Payment,Completed,USD,10.00,,10.00\n',
+        encoding='utf-8-sig',
+    )
+
+    importer = PaypalTransactionsImporter(datetime.date(2021, 1, 1), pad=pad)
+    entries = importer.extract(cache.get_file(str(path)))
+
+    # Every entry is a whole directive
+    assert all(hasattr(entry, 'date') for entry in entries)
+    assert sum(isinstance(entry, data.Pad) for entry in entries) == num_pads
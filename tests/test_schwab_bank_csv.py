@@ -0,0 +1,47 @@
+import pytest
+from beancount.ingest import cache
+
+from beancount_importers.schwab.bank_csv import SchwabBankTransactionsImporter
+
+
+HEADER = (
+    '"Transactions  for Checking account XXXXXX-1234 as of 01/01/2022"\n'
+    '"Date","Type","Check #","Description","Withdrawal (-)",'
+    '"Deposit (+)","RunningBalance"\n'
+)
+
+
+@pytest.mark.parametrize('filename, account_suffix', [
+    ('Personal_Checking_Transactions_20220101-123456.CSV', 'PersonalChecking'),
+    ('Checking2_Transactions_20220101-1.CSV', 'Checking2'),
+    # Account names must start with a letter
+    ('_Checking_Transactions_20220101-1.CSV', None),
+    # No punctuation from the old [A-z] range
+    ('Personal^_Checking_Transactions_20220101-1.CSV', None),
+    ('Personal`_Checking_Transactions_20220101-1.CSV', None),
+    # The dot before the extension is literal
+    ('Personal_Checking_Transactions_20220101-1xCSV', None),
+])
+def test_file_account_suffix(tmp_path, filename, account_suffix):
+    file_cache = cache.get_file(str(tmp_path / filename))
+    importer = SchwabBankTransactionsImporter()
+    assert importer._file_account_suffix(file_cache) == account_suffix
+
+
+@pytest.mark.parametrize('filename, is_valid', [
+    ('Personal_Checking_Transactions_20220101-123456.CSV', True),
+    ('_Checking_Transactions_20220101-1.CSV', False),
+    ('Personal^_Checking_Transactions_20220101-1.CSV', False),
+    ('Personal`_Checking_Transactions_20220101-1.CSV', False),
+    ('Personal_Checking_Transactions_20220101-1xCSV', False),
+])
+def test_identify(tmp_path, filename, is_valid):
+    path = tmp_path / filename
+    path.write_text(HEADER, encoding='utf8')
+
+    importer = SchwabBankTransactionsImporter()
+    file_cache = cache.get_file(str(path))
+    assert importer.identify(file_cache) == is_valid
+    if is_valid:
+        # Anything identify accepts has an account to extract into
+        assert importer._file_account_suffix(file_cache) is not None
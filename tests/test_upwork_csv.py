@@ -0,0 +1,28 @@
+import pytest
+
+from beancount_importers.upwork_csv import get_last_four_from_upwork_description
+
+
+@pytest.mark.parametrize('txn_desc, last_four', [
+    ('Withdrawal to Bank, Inc: xxxx-1234', '1234'),
+    ('Withdrawal: xxxx-12345', '1234'),
+    # The last marker followed by four digits wins
+    ('a: xxxx-1234 b: xxxx-5678', '5678'),
+    ('a: xxxx-1234 b: xxxx-12', '1234'),
+    # Only the first line is searched
+    ('a: xxxx-1234\nb: xxxx-5678', '1234'),
+])
+def test_get_last_four_from_upwork_description(txn_desc, last_four):
+    assert get_last_four_from_upwork_description(txn_desc) == last_four
+
+
+@pytest.mark.parametrize('txn_desc', [
+    'Withdrawal to Bank, Inc',
+    'Withdrawal: xxxx-12',
+    'Withdrawal: xxxx-12a4',
+    'Withdrawal: xxxx-١٢٣٤',
+    'Withdrawal\n: xxxx-1234',
+])
+def test_get_last_four_from_upwork_description_invalid(txn_desc):
+    with pytest.raises(ValueError):
+        get_last_four_from_upwork_description(txn_desc)
@@ -0,0 +1,102 @@
+import datetime
+
+import pytest
+from beancount.core import data
+
+from beancount_importers.paypal_csv import PaypalTransactionsImporter
+from beancount_importers.utils import extract_many
+from beancount_importers.utils import simple_posting, split_txn
+
+
+PAYPAL_HEADER = (
+    'Date,Time,TimeZone,Name,Type,Status,Currency,Amount,Receipt ID,Balance\n'
+)
+
+
+def two_posting_txn(first_amount, second_amount):
+    """Create a transaction with two USD postings."""
+    return data.Transaction(
+        meta=data.new_metadata('test', 0),
+        date=datetime.date(2021, 1, 1),
+        flag='*',
+        payee=None,
+        narration='',
+        tags=data.EMPTY_SET,
+        links=data.EMPTY_SET,
+        postings=[
+            simple_posting('Assets:A', first_amount),
+            simple_posting('Assets:B', second_amount),
+        ],
+    )
+
+
+@pytest.mark.parametrize('amounts, expected', [
+    # (src, dst) as indices into the postings
+    (('-5', '5'), (0, 1)),
+    (('5', '-5'), (1, 0)),
+    (('0', '0'), (None, None)),
+    # Postings that don't balance
+    (('0', '5'), (None, 1)),
+    (('5', '0'), (None, 0)),
+    (('5', '5'), (None, 1)),
+    (('-5', '-5'), (1, None)),
+])
+def test_split_txn(amounts, expected):
+    txn = two_posting_txn(*amounts)
+    assert split_txn(txn) == tuple(
+        None if index is None else txn.postings[index]
+        for index in expected
+    )
+
+
+def write_paypal_statement(path, rows):
+    """Write a minimal Paypal CSV statement."""
+    with open(path, 'w', encoding='utf-8-sig', newline='') as fh:
+        fh.write(PAYPAL_HEADER)
+        for date, name, amount, balance in rows:
+            fh.write(
+                f'{date},10:00,PST,{name},General Payment,Completed,'
+                f'USD,{amount},,{balance}\n'
+            )
+
+
+def test_extract_many(tmp_path, monkeypatch):
+    write_paypal_statement(
+        tmp_path / 'paypal-transactions_2021-01-01_2021-01-31.CSV',
+        [
+            ('2021-01-02', 'Alice', '10.00', '10.00'),
+            ('2021-01-03', 'Bob', '5.00', '15.00'),
+        ],
+    )
+    write_paypal_statement(
+        tmp_path / 'paypal-transactions_2021-01-01_2021-01-30.CSV',
+        [
+            ('2021-01-02', 'Carol', '1.00', '16.00'),
+            ('2021-01-04', 'Dave', '2.00', '18.00'),
+        ],
+    )
+
+    # Relative paths, and a transaction on the open date
+    monkeypatch.chdir(tmp_path)
+    importer = PaypalTransactionsImporter(
+        datetime.date(2021, 1, 1),
+        open_date=datetime.date(2021, 1, 2),
+    )
+    entries = extract_many([
+        'paypal-transactions_2021-01-01_2021-01-31.CSV',
+        'paypal-transactions_2021-01-01_2021-01-30.CSV',
+    ], importer, max_workers=2)
+
+    # Open and Pad directives aren't repeated per file
+    open_accounts = [
+        entry.account for entry in entries if isinstance(entry, data.Open)
+    ]
+    assert len(open_accounts) == len(set(open_accounts)) == 4
+    assert sum(isinstance(entry, data.Pad) for entry in entries) == 1
+
+    # Sorted by date, opens first, then files in the order given
+    assert isinstance(entries[0], data.Open)
+    txns = [entry for entry in entries if isinstance(entry, data.Transaction)]
+    assert [txn.narration for txn in txns] == ['Alice', 'Carol', 'Bob', 'Dave']
+    dates = [entry.date for entry in entries]
+    assert dates == sorted(dates)